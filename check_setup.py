@@ -4,8 +4,10 @@ Run this before running the main automation
 
 WINDOWS ONLY - This project is designed for Windows operating systems
 """
+import os
 import sys
 import subprocess
+import importlib.util
 import platform
 from pathlib import Path
 
@@ -40,15 +42,24 @@ def check_dependencies():
         'google.auth',
         'googleapiclient',
         'PIL',
-        'retry'
+        'retry',
+        'tenacity',
+        'orjson',
+        'httpx',
+        'h2'
     ]
     
     missing = []
     for package in required:
+        # find_spec only locates the module, it doesn't execute it
         try:
-            __import__(package)
+            spec = importlib.util.find_spec(package)
+        except ModuleNotFoundError:
+            spec = None
+        
+        if spec is not None:
             print(f"[OK] {package}")
-        except ImportError:
+        else:
             print(f"[MISSING] {package}")
             missing.append(package)
     
@@ -63,7 +74,8 @@ def check_ffmpeg():
     try:
         result = subprocess.run(
             ['ffmpeg', '-version'],
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
             text=True,
             timeout=5
         )
@@ -95,6 +107,13 @@ def check_env_file():
     with open(env_path, 'r') as f:
         content = f.read()
     
+    # Parse once into a dict instead of re-scanning the file for every key
+    env = {}
+    for line in content.splitlines():
+        if '=' in line and not line.lstrip().startswith('#'):
+            key, value = line.split('=', 1)
+            env[key.strip()] = value.strip()
+    
     required_keys = [
         'COMET_API_KEY',
         'OPENAI_API_KEY',
@@ -102,14 +121,11 @@ def check_env_file():
         'YOUTUBE_CLIENT_SECRET'
     ]
     
-    missing_keys = []
-    placeholder_keys = []
-    
-    for key in required_keys:
-        if key not in content:
-            missing_keys.append(key)
-        elif f'{key}=your_' in content or f'{key}=' in content and content.split(f'{key}=')[1].split('\n')[0].strip() == '':
-            placeholder_keys.append(key)
+    missing_keys = [key for key in required_keys if key not in env]
+    placeholder_keys = [
+        key for key in required_keys
+        if key in env and (not env[key] or env[key].startswith('your_'))
+    ]
     
     if missing_keys:
         print(f"[ERROR] .env file missing keys: {', '.join(missing_keys)}")
@@ -129,9 +145,11 @@ def check_directories():
     dirs = ['audio', 'thumbnails', 'metadata', 'src']
     all_exist = True
     
+    # One directory listing instead of a stat() per folder
+    existing = {entry.name for entry in os.scandir('.') if entry.is_dir()}
+    
     for dir_name in dirs:
-        dir_path = Path(dir_name)
-        if dir_path.exists():
+        if dir_name in existing:
             print(f"[OK] {dir_name}/ folder")
         else:
             print(f"[ERROR] {dir_name}/ folder missing")
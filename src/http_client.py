@@ -0,0 +1,41 @@
+"""
+Shared HTTP client for API calls and downloads
+A single connection pool (HTTP/2 + keep-alive) is reused across the pipeline
+so repeated requests to the same host skip the TCP and TLS handshakes
+"""
+import threading
+import httpx
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Get the process-wide HTTP client, creating it on first use
+    
+    Returns:
+        Shared httpx.Client with HTTP/2 and connection pooling enabled
+    """
+    global _client
+    
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=True,
+                timeout=httpx.Timeout(60.0),
+                limits=httpx.Limits(max_keepalive_connections=20),
+                follow_redirects=True
+            )
+    
+    return _client
+
+
+def close_http_client():
+    """Close the shared HTTP client and release its pooled connections"""
+    global _client
+    
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -5,32 +5,77 @@ WINDOWS ONLY - This project is designed for Windows operating systems
 """
 import os
 import sys
-import json
 import time
+import shutil
+import itertools
 import logging
+import logging.handlers
+import socket
+import subprocess
 import platform
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict
+import orjson
 from dotenv import load_dotenv
 
-# Import our modules
-from suno import SunoAPI, create_lofi_prompt
-from openai_gen import OpenAIGenerator
-from youtube_upload import YouTubeUploader
+# Import our modules (API clients are imported lazily in LoFiAutomation.__init__
+# because the OpenAI SDK and googleapiclient are slow to import)
 from wake_lock import WakeLock
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('automation.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Hardware H.264 encoders in order of preference, with their fastest settings
+HW_VIDEO_ENCODERS = {
+    'h264_nvenc': ['-preset', 'p1'],        # NVIDIA
+    'h264_qsv': ['-preset', 'veryfast'],    # Intel QuickSync
+    'h264_amf': ['-quality', 'speed'],      # AMD
+}
+
+# API hosts resolved at startup so the first request doesn't wait on DNS
+API_HOSTS = [
+    'api.cometapi.com',
+    'api.openai.com',
+    'oauth2.googleapis.com',
+    'www.googleapis.com',
+]
+
+# Software fallback tuned for a single static image
+SOFTWARE_VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28', '-tune', 'stillimage']
+
+
+def setup_logging():
+    """
+    Configure root logging once for the whole application
+    Library modules only create loggers, so this is the single place handlers are added
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    
+    log_format = '%(asctime)s - %(levelname)s - %(message)s'
+    
+    # MemoryHandler hands records to its target as-is, so the file handler
+    # needs its own formatter
+    file_handler = logging.FileHandler('automation.log')
+    file_handler.setFormatter(logging.Formatter(log_format))
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format=log_format,
+        handlers=[
+            # Batch file writes; flushed every 1000 records, on ERROR, and at exit
+            logging.handlers.MemoryHandler(
+                1000,
+                flushLevel=logging.ERROR,
+                target=file_handler
+            ),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
 
 class LoFiAutomation:
     """Main automation orchestrator"""
@@ -51,6 +96,10 @@ class LoFiAutomation:
         
         # Initialize API clients
         logger.info("Initializing API clients...")
+        from suno import SunoAPI
+        from openai_gen import OpenAIGenerator
+        from youtube_upload import YouTubeUploader
+        
         self.suno = SunoAPI(self.suno_key)
         self.openai = OpenAIGenerator(self.openai_key)
         self.youtube = YouTubeUploader(
@@ -65,8 +114,18 @@ class LoFiAutomation:
         self.thumbnail_dir = self.base_dir / 'thumbnails'
         self.metadata_dir = self.base_dir / 'metadata'
         
+        existing = {entry.name for entry in os.scandir(self.base_dir) if entry.is_dir()}
         for directory in [self.audio_dir, self.thumbnail_dir, self.metadata_dir]:
-            directory.mkdir(exist_ok=True)
+            if directory.name not in existing:
+                directory.mkdir(exist_ok=True)
+        
+        self._prewarm_dns()
+        
+        # Suffix for timestamp IDs so runs started in the same second never collide
+        self._id_counter = itertools.count()
+        
+        # Locate ffmpeg once instead of probing it on every video
+        self._probe_ffmpeg()
         
         logger.info("Automation system initialized successfully!")
     
@@ -86,44 +145,126 @@ class LoFiAutomation:
             logger.error("Please check your .env file and add valid API keys")
             sys.exit(1)
     
-    def generate_timestamp_id(self) -> str:
-        """Generate unique timestamp-based ID"""
-        return datetime.now().strftime('%Y%m%d_%H%M%S')
+    def _prewarm_dns(self):
+        """Resolve API hosts once so later lookups hit the OS resolver cache"""
+        for host in API_HOSTS:
+            try:
+                socket.getaddrinfo(host, 443)
+            except OSError as e:
+                logger.warning(f"Could not resolve {host}: {e}")
+    
+    def _probe_ffmpeg(self):
+        """Check once whether ffmpeg is available on PATH"""
+        self._ffmpeg_path = shutil.which('ffmpeg')
+        self._ffmpeg_ok = self._ffmpeg_path is not None
+        
+        self._hw_encoder = None
+        
+        if not self._ffmpeg_ok:
+            logger.warning("ffmpeg not found on PATH - video creation will fail (install with: winget install ffmpeg)")
+            return
+        
+        logger.info(f"Using ffmpeg: {self._ffmpeg_path}")
+        
+        # Look for a hardware H.264 encoder compiled into this ffmpeg build
+        try:
+            result = subprocess.run(
+                [self._ffmpeg_path, '-hide_banner', '-encoders'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=10
+            )
+            encoders = result.stdout
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Could not list ffmpeg encoders: {e}")
+            encoders = ''
+        
+        # Being compiled in doesn't mean the GPU is there (Windows builds ship
+        # all three), so take the first one that can encode a test frame
+        for encoder in HW_VIDEO_ENCODERS:
+            if f' {encoder} ' in encoders and self._test_encoder(encoder):
+                self._hw_encoder = encoder
+                logger.info(f"Hardware video encoder available: {encoder}")
+                break
+    
+    def _test_encoder(self, encoder: str) -> bool:
+        """
+        Encode a single synthetic frame to check a hardware encoder actually works
+        
+        Args:
+            encoder: ffmpeg encoder name from HW_VIDEO_ENCODERS
+        
+        Returns:
+            True if the test encode succeeded
+        """
+        try:
+            result = subprocess.run(
+                [
+                    self._ffmpeg_path, '-hide_banner',
+                    '-f', 'lavfi', '-i', 'color=s=256x256',
+                    '-frames:v', '1',
+                    '-c:v', encoder, *HW_VIDEO_ENCODERS[encoder],
+                    '-f', 'null', '-'
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=15
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
     
-    def check_duplicate(self, timestamp_id: str) -> bool:
-        """Check if a video with this timestamp already exists"""
-        metadata_file = self.metadata_dir / f'metadata_{timestamp_id}.json'
-        return metadata_file.exists()
+    def generate_timestamp_id(self) -> str:
+        """Generate unique timestamp-based ID (counter suffix keeps same-second runs apart)"""
+        return f"{datetime.now():%Y%m%d_%H%M%S}_{next(self._id_counter)}"
     
     def create_video_from_audio(self, audio_path: str, output_path: str, thumbnail_path: str):
         """
         Create a simple video file from audio and thumbnail image
-        Uses ffmpeg to create a static image video
+        Uses ffmpeg to create a static image video, on the GPU when a
+        hardware encoder is available, otherwise with libx264
         
         Args:
             audio_path: Path to audio file
             output_path: Path for output video
             thumbnail_path: Path to thumbnail image
         """
-        import subprocess
-        
         logger.info("Creating video file from audio and thumbnail...")
         
-        try:
-            # Check if ffmpeg is available
-            subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            logger.error("ffmpeg not found. Installing ffmpeg-python...")
-            subprocess.run([sys.executable, '-m', 'pip', 'install', 'ffmpeg-python'], check=True)
+        if not self._ffmpeg_ok:
+            raise RuntimeError("ffmpeg not found on PATH. Install it with: winget install ffmpeg")
+        
+        if self._hw_encoder:
+            video_args = ['-c:v', self._hw_encoder] + HW_VIDEO_ENCODERS[self._hw_encoder]
+            try:
+                self._run_ffmpeg(audio_path, output_path, thumbnail_path, video_args)
+                return
+            except subprocess.CalledProcessError:
+                # Encoder passed the startup test but failed on real input - don't try it again
+                logger.warning(f"Hardware encoder {self._hw_encoder} failed, falling back to libx264")
+                self._hw_encoder = None
         
+        self._run_ffmpeg(audio_path, output_path, thumbnail_path, SOFTWARE_VIDEO_ARGS)
+    
+    def _run_ffmpeg(self, audio_path: str, output_path: str, thumbnail_path: str, video_args: list):
+        """
+        Run ffmpeg to combine a looped still image with audio
+        
+        Args:
+            audio_path: Path to audio file
+            output_path: Path for output video
+            thumbnail_path: Path to thumbnail image
+            video_args: Video codec arguments
+        """
         # Create video with static image and audio
         command = [
-            'ffmpeg',
+            self._ffmpeg_path,
             '-loop', '1',
+            '-framerate', '1',  # Static image: 1 fps instead of the default 25
             '-i', thumbnail_path,
             '-i', audio_path,
-            '-c:v', 'libx264',
-            '-tune', 'stillimage',
+            *video_args,
             '-c:a', 'aac',
             '-b:a', '192k',
             '-pix_fmt', 'yuv420p',
@@ -132,12 +273,30 @@ class LoFiAutomation:
             output_path
         ]
         
-        try:
-            subprocess.run(command, check=True, capture_output=True)
-            logger.info(f"Video created successfully: {output_path}")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to create video: {e.stderr.decode()}")
-            raise
+        # Stream stderr line by line instead of buffering the whole encode log;
+        # only the tail is kept for error reporting
+        stderr_tail = deque(maxlen=20)
+        with subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace'
+        ) as process:
+            for line in process.stderr:
+                line = line.rstrip()
+                if line:
+                    stderr_tail.append(line)
+                    logger.debug(f"[ffmpeg] {line}")
+            
+            returncode = process.wait()
+        
+        if returncode != 0:
+            stderr_text = '\n'.join(stderr_tail)
+            logger.error(f"Failed to create video: {stderr_text}")
+            raise subprocess.CalledProcessError(returncode, command, stderr=stderr_text)
+        
+        logger.info(f"Video created successfully: {output_path}")
     
     def run_pipeline(self, custom_prompt: str = None) -> Dict:
         """
@@ -152,11 +311,6 @@ class LoFiAutomation:
         """
         timestamp_id = self.generate_timestamp_id()
         
-        # Check for duplicates
-        if self.check_duplicate(timestamp_id):
-            logger.warning(f"Duplicate detected for {timestamp_id}, skipping...")
-            return None
-        
         logger.info("="*70)
         logger.info(f"Starting new lo-fi video generation pipeline: {timestamp_id}")
         logger.info("="*70)
@@ -170,21 +324,42 @@ class LoFiAutomation:
             if custom_prompt:
                 music_prompt = custom_prompt
             else:
+                from suno import create_lofi_prompt
                 music_prompt = create_lofi_prompt()
             
             logger.info(f"Music prompt: {music_prompt}")
             
-            # STEP 2: Generate and download music
+            # STEPS 2-3: Music and metadata/thumbnail only depend on the prompt,
+            # so run them concurrently and join before the video is created
             audio_path = self.audio_dir / f'lofi_{timestamp_id}.mp3'
-            logger.info("Step 1/6: Generating lo-fi music...")
-            self.suno.generate_and_download(music_prompt, str(audio_path), duration=120)
-            
-            # STEP 3: Generate metadata and thumbnail prompt
-            logger.info("Step 2/6: Generating video metadata...")
             thumbnail_path = self.thumbnail_dir / f'thumb_{timestamp_id}.png'
-            metadata = self.openai.generate_complete_assets(music_prompt, str(thumbnail_path))
             
-            logger.info("Step 3/6: Thumbnail generated!")
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                # Refresh an expired YouTube token while generation is running
+                # instead of at upload time
+                auth_future = executor.submit(self.youtube.refresh_if_needed)
+                
+                logger.info("Step 1/6: Generating lo-fi music...")
+                music_future = executor.submit(
+                    self.suno.generate_and_download, music_prompt, str(audio_path), duration=120
+                )
+                
+                logger.info("Step 2/6: Generating video metadata...")
+                assets_future = executor.submit(
+                    self.openai.generate_complete_assets, music_prompt, str(thumbnail_path)
+                )
+                
+                metadata = assets_future.result()
+                logger.info("Step 3/6: Thumbnail generated!")
+                
+                music_future.result()
+                logger.info("Music generated and downloaded!")
+                
+                # Only a pre-warm - the upload refreshes the token itself if this failed
+                try:
+                    auth_future.result()
+                except Exception as e:
+                    logger.warning(f"Could not pre-refresh YouTube token: {e}")
             
             # STEP 4: Create video from audio and thumbnail
             logger.info("Step 4/6: Creating video file...")
@@ -219,8 +394,7 @@ class LoFiAutomation:
             }
             
             metadata_path = self.metadata_dir / f'metadata_{timestamp_id}.json'
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(complete_metadata, f, indent=2, ensure_ascii=False)
+            metadata_path.write_bytes(orjson.dumps(complete_metadata, option=orjson.OPT_INDENT_2))
             
             logger.info("="*70)
             logger.info("Pipeline completed successfully!")
@@ -282,6 +456,8 @@ class LoFiAutomation:
 
 def main():
     """Main entry point"""
+    setup_logging()
+    
     # Check if running on Windows
     if platform.system() != "Windows":
         print("=" * 60)
@@ -298,20 +474,22 @@ def main():
     ╚══════════════════════════════════════════════════════════╝
     """)
     
+    # Show usage before initializing (and importing) the API clients
+    if len(sys.argv) > 1 and sys.argv[1] != '--loop':
+        print("Usage:")
+        print("  python main.py              # Generate one video")
+        print("  python main.py --loop 5     # Generate 5 videos")
+        print("  python main.py --loop 5 120 # Generate 5 videos with 120s delay")
+        return
+    
     try:
         automation = LoFiAutomation()
         
         # Check command line arguments
         if len(sys.argv) > 1:
-            if sys.argv[1] == '--loop':
-                count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
-                delay = int(sys.argv[3]) if len(sys.argv) > 3 else 60
-                automation.run_multiple(count, delay)
-            else:
-                print("Usage:")
-                print("  python main.py              # Generate one video")
-                print("  python main.py --loop 5     # Generate 5 videos")
-                print("  python main.py --loop 5 120 # Generate 5 videos with 120s delay")
+            count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+            delay = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+            automation.run_multiple(count, delay)
         else:
             # Single video generation
             automation.run_pipeline()
@@ -322,6 +500,10 @@ def main():
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        # Release pooled connections held by the shared HTTP client
+        from http_client import close_http_client
+        close_http_client()
 
 
 if __name__ == "__main__":
@@ -1,21 +1,28 @@
 """
 OpenAI API Integration for Metadata and Thumbnail Generation
 """
-import os
+import io
+import json
 import logging
 from typing import Dict, List
 from retry import retry
 from openai import OpenAI
+from PIL import Image
+from http_client import get_http_client
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# The shared client's 60s timeout suits Suno/CDN calls, but long GPT completions
+# and DALL-E generations need the SDK's default 10 minutes
+OPENAI_TIMEOUT = 600.0
+
 
 class OpenAIGenerator:
     """Handle OpenAI API for text and image generation"""
     
     def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+        self.http = get_http_client()
+        self.client = OpenAI(api_key=api_key, http_client=self.http, timeout=OPENAI_TIMEOUT)
     
     @retry(tries=3, delay=5, backoff=2)
     def generate_video_metadata(self, music_prompt: str) -> Dict[str, any]:
@@ -51,23 +58,13 @@ Return ONLY valid JSON with these exact keys: title, description, tags, thumbnai
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.8,
-                max_tokens=1500
+                max_tokens=1500,
+                response_format={"type": "json_object"}  # JSON mode: no markdown fences to strip
             )
             
-            content = response.choices[0].message.content.strip()
+            content = response.choices[0].message.content
             
             # Parse JSON from response
-            import json
-            
-            # Remove markdown code blocks if present
-            if content.startswith("```json"):
-                content = content.split("```json")[1]
-            if content.startswith("```"):
-                content = content.split("```")[1]
-            if content.endswith("```"):
-                content = content.rsplit("```", 1)[0]
-            
-            content = content.strip()
             metadata = json.loads(content)
             
             logger.info(f"Generated title: {metadata.get('title')}")
@@ -105,21 +102,18 @@ Return ONLY valid JSON with these exact keys: title, description, tags, thumbnai
             
             image_url = response.data[0].url
             
-            # Download the image
-            import requests
-            img_response = requests.get(image_url, timeout=60)
-            img_response.raise_for_status()
-            
-            # Save raw image
-            temp_path = output_path.replace('.png', '_temp.png')
-            with open(temp_path, 'wb') as f:
-                f.write(img_response.content)
+            # Download the image into memory and decode it from there,
+            # avoiding a temp file write + read + delete
+            buffer = io.BytesIO()
+            with self.http.stream('GET', image_url, timeout=60) as img_response:
+                img_response.raise_for_status()
+                for chunk in img_response.iter_bytes():
+                    buffer.write(chunk)
+            buffer.seek(0)
             
             # Resize to exact YouTube thumbnail specs (1280x720)
-            self._resize_thumbnail(temp_path, output_path)
-            
-            # Clean up temp file
-            os.remove(temp_path)
+            with Image.open(buffer) as img:
+                self._resize_thumbnail(img, output_path)
             
             logger.info(f"Thumbnail saved to: {output_path}")
             return output_path
@@ -128,28 +122,25 @@ Return ONLY valid JSON with these exact keys: title, description, tags, thumbnai
             logger.error(f"Failed to generate thumbnail: {e}")
             raise
     
-    def _resize_thumbnail(self, input_path: str, output_path: str):
+    def _resize_thumbnail(self, img, output_path: str):
         """
         Resize image to YouTube thumbnail specifications (1280x720)
         
         Args:
-            input_path: Path to source image
+            img: Source PIL image
             output_path: Path to save resized image
         """
-        from PIL import Image
-        
-        with Image.open(input_path) as img:
-            # Convert to RGB if needed
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            
-            # Resize to 1280x720 (16:9 aspect ratio)
-            img_resized = img.resize((1280, 720), Image.Resampling.LANCZOS)
-            img_resized.save(output_path, 'PNG', quality=95)
+        # Convert to RGB if needed
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+            img = background
+        
+        # Resize to 1280x720 (16:9 aspect ratio)
+        img_resized = img.resize((1280, 720), Image.Resampling.LANCZOS)
+        img_resized.save(output_path, 'PNG', quality=95)
     
     def generate_complete_assets(self, music_prompt: str, thumbnail_path: str) -> Dict:
         """
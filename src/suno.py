@@ -4,14 +4,35 @@ CometAPI provides unofficial access to Suno's music generation capabilities
 """
 import os
 import time
+import random
+import httpx
+import orjson
 import requests
 import logging
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from retry import retry
+from http_client import get_http_client
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Task polling schedule: start fast, back off geometrically, add jitter
+POLL_TIMEOUT = 300  # seconds
+POLL_BASE_DELAY = 2.0
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 15.0
+POLL_JITTER = 1.0
+
+# Maximum tracks generated at once (CometAPI rate limits)
+MAX_CONCURRENT_TASKS = 4
+
+# A 429 on submit means the task was refused, so it is safe to resend
+SUBMIT_RATE_LIMIT_RETRIES = 3
+SUBMIT_RATE_LIMIT_DELAY = 10.0  # seconds, when no Retry-After is given
+
 
 class SunoAPI:
     """Handle CometAPI music generation using Suno AI"""
@@ -23,8 +44,38 @@ class SunoAPI:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        
+        # One pooled session so submit and polling reuse TLS connections.
+        # Transient HTTP failures on GETs are retried inside the adapter (honouring
+        # Retry-After); the final response is returned for raise_for_status().
+        # POSTs are left out: a 5xx or read timeout can arrive after the task was
+        # accepted, and resubmitting would start a second paid generation
+        retries = Retry(
+            total=5,
+            backoff_factor=1.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(max_retries=retries, pool_connections=4, pool_maxsize=16))
+        
+        # Audio CDN downloads go through the shared HTTP/2 client (no API key attached)
+        self.http = get_http_client()
+    
+    def close(self):
+        """Close the HTTP session and release pooled connections"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
     
-    @retry(tries=3, delay=5, backoff=2)
     def generate_music(self, prompt: str, duration: int = 120) -> Dict:
         """
         Generate lo-fi music using CometAPI (Suno)
@@ -37,11 +88,14 @@ class SunoAPI:
         Returns:
             Dictionary with generation data including audio URL
         """
-        logger.info(f"Generating music with prompt: {prompt}")
+        logger.info("Generating music with prompt: %s", prompt)
         
         # Generate a simple title based on timestamp
-        from datetime import datetime
-        title = f"Lo-Fi Study Music {datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        now = datetime.now()
+        title = (
+            f"Lo-Fi Study Music {now.year:04d}{now.month:02d}{now.day:02d}_"
+            f"{now.hour:02d}{now.minute:02d}{now.second:02d}"
+        )
         
         # Use inspiration mode with gpt_description_prompt for instrumental
         payload = {
@@ -56,67 +110,87 @@ class SunoAPI:
         try:
             # Step 1: Submit the music generation task
             logger.info("Submitting music generation task to CometAPI...")
-            response = requests.post(
-                f"{self.base_url}/suno/submit/music",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            for rate_limit_retry in range(SUBMIT_RATE_LIMIT_RETRIES + 1):
+                response = self.session.post(
+                    f"{self.base_url}/suno/submit/music",
+                    data=orjson.dumps(payload),  # Content-Type is set on the session
+                    timeout=30
+                )
+                if response.status_code != 429 or rate_limit_retry == SUBMIT_RATE_LIMIT_RETRIES:
+                    break
+                
+                try:
+                    wait = float(response.headers.get('Retry-After', SUBMIT_RATE_LIMIT_DELAY))
+                except ValueError:
+                    wait = SUBMIT_RATE_LIMIT_DELAY
+                logger.warning("Rate limited on submit, retrying in %.0fs", wait)
+                time.sleep(wait)
             
             # Check response before raising for status
             if response.status_code != 200:
                 try:
-                    error_detail = response.json()
-                    logger.error(f"API Error Response: {error_detail}")
-                except:
-                    logger.error(f"API Error Response (raw): {response.text}")
+                    error_detail = orjson.loads(response.content)
+                    logger.error("API Error Response: %s", error_detail)
+                except orjson.JSONDecodeError:
+                    logger.error("API Error Response (raw): %s", response.text)
             
             response.raise_for_status()
             
-            result = response.json()
+            result = orjson.loads(response.content)
             
             if result.get('code') != 'success' or not result.get('data'):
                 raise ValueError(f"Task submission failed: {result}")
             
             task_id = result['data']
-            logger.info(f"Task submitted successfully. Task ID: {task_id}")
+            logger.info("Task submitted successfully. Task ID: %s", task_id)
             
             # Step 2: Poll for completion
             logger.info("Waiting for music generation to complete...")
-            max_attempts = 60  # 5 minutes max (60 * 5 seconds)
+            deadline = time.monotonic() + POLL_TIMEOUT
+            delay = POLL_BASE_DELAY
             attempt = 0
+            etag = None
             
-            while attempt < max_attempts:
+            while time.monotonic() < deadline:
                 attempt += 1
-                time.sleep(5)  # Wait 5 seconds between polls
                 
-                fetch_response = requests.get(
+                # First status probe goes out right after submit on the warm connection
+                if attempt > 1:
+                    time.sleep(delay + random.uniform(0, POLL_JITTER))
+                    delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+                
+                # Conditional request: an unchanged task comes back as an empty 304
+                fetch_response = self.session.get(
                     f"{self.base_url}/suno/fetch/{task_id}",
-                    headers=self.headers,
+                    headers={"If-None-Match": etag} if etag else None,
                     timeout=30
                 )
+                if fetch_response.status_code == 304:
+                    logger.debug("Task %s unchanged (attempt %d)", task_id, attempt)
+                    continue
                 fetch_response.raise_for_status()
+                etag = fetch_response.headers.get("ETag")
                 
-                fetch_data = fetch_response.json()
+                fetch_data = orjson.loads(fetch_response.content)
                 
                 if fetch_data.get('code') == 'success' and fetch_data.get('data'):
                     data = fetch_data['data']
                     status = data.get('status', '')
                     
                     if status == 'complete':
-                        logger.info(f"Music generation completed successfully!")
+                        logger.info("Music generation completed successfully!")
                         return data
                     elif status == 'error':
                         raise ValueError(f"Music generation failed: {data.get('error_message', 'Unknown error')}")
                     else:
-                        logger.info(f"Status: {status} (attempt {attempt}/{max_attempts})")
+                        logger.info("Status: %s (attempt %d)", status, attempt)
                 else:
-                    logger.warning(f"Unexpected fetch response: {fetch_data}")
+                    logger.warning("Unexpected fetch response: %s", fetch_data)
             
             raise TimeoutError("Music generation timed out after 5 minutes")
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to generate music: {e}")
+            logger.error("Failed to generate music: %s", e)
             raise
     
     @retry(tries=3, delay=5, backoff=2)
@@ -131,21 +205,35 @@ class SunoAPI:
         Returns:
             Path to downloaded file
         """
-        logger.info(f"Downloading audio from: {audio_url}")
+        logger.info("Downloading audio from: %s", audio_url)
         
         try:
-            response = requests.get(audio_url, stream=True, timeout=60)
-            response.raise_for_status()
-            
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            with self.http.stream("GET", audio_url, timeout=60) as response:
+                response.raise_for_status()
+                
+                # Size on disk is only known up front for uncompressed bodies
+                size = 0
+                if not response.headers.get('Content-Encoding'):
+                    size = int(response.headers.get('Content-Length', 0))
+                
+                # 256 KB chunks + 1 MB write buffer: far fewer write() syscalls than 8 KB;
+                # writelines drives the chunk iterator from C instead of a Python loop
+                with open(output_path, 'wb', buffering=1024 * 1024) as f:
+                    if size > 0:
+                        # Reserve the whole file at once so it's allocated contiguously
+                        if hasattr(os, 'posix_fallocate'):
+                            os.posix_fallocate(f.fileno(), 0, size)
+                        else:
+                            f.truncate(size)
+                    
+                    f.writelines(response.iter_bytes(chunk_size=262144))
+                    f.truncate()  # Drop any reserved space that wasn't written
             
-            logger.info(f"Audio downloaded successfully to: {output_path}")
+            logger.info("Audio downloaded successfully to: %s", output_path)
             return output_path
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to download audio: {e}")
+        except httpx.HTTPError as e:
+            logger.error("Failed to download audio: %s", e)
             raise
     
     def generate_and_download(self, prompt: str, output_path: str, duration: int = 120) -> str:
@@ -180,13 +268,72 @@ class SunoAPI:
                 audio_url = result_data['data'][0].get('audio_url')
         
         if not audio_url:
-            logger.error(f"Could not find audio_url in response: {result_data}")
+            logger.error("Could not find audio_url in response: %s", result_data)
             raise ValueError("No audio URL in response data")
         
-        logger.info(f"Found audio URL: {audio_url}")
+        logger.info("Found audio URL: %s", audio_url)
         
         # Download audio
         return self.download_audio(audio_url, output_path)
+    
+    def generate_and_download_many(
+        self,
+        jobs: List[Tuple[str, str]],
+        duration: int = 120,
+        max_workers: int = MAX_CONCURRENT_TASKS
+    ) -> List[str]:
+        """
+        Generate and download several tracks concurrently
+        Remote generation time overlaps, so N tracks take about as long as the slowest one
+        
+        Args:
+            jobs: List of (prompt, output_path) pairs
+            duration: Track duration in seconds (note: actual duration controlled by Suno)
+            max_workers: Maximum number of tracks generated at once
+        
+        Returns:
+            Paths to downloaded audio files, in the same order as jobs
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.generate_and_download, prompt, output_path, duration)
+                for prompt, output_path in jobs
+            ]
+            return [future.result() for future in futures]
+
+
+# Prompt building blocks (module-level tuples, built once)
+_TEMPOS = ("80 BPM", "85 BPM", "90 BPM", "75 BPM")
+_AMBIENCES = (
+    "soft rain ambience",
+    "gentle cafe background",
+    "quiet library atmosphere",
+    "peaceful nature sounds",
+    "subtle vinyl crackle"
+)
+_INSTRUMENTS = (
+    "calming synth pads",
+    "mellow piano keys",
+    "warm bass lines",
+    "jazzy guitar chords",
+    "smooth rhodes piano"
+)
+_MOODS = (
+    "study focus",
+    "late night relaxation",
+    "peaceful meditation",
+    "creative flow",
+    "chill vibes"
+)
+
+# Every finished prompt string, so create_lofi_prompt is a single random.choice
+_PROMPTS = tuple(
+    f"Lofi study music, {tempo}, {ambience}, {instrument}, {mood}"
+    for tempo in _TEMPOS
+    for ambience in _AMBIENCES
+    for instrument in _INSTRUMENTS
+    for mood in _MOODS
+)
 
 
 def create_lofi_prompt() -> str:
@@ -196,35 +343,4 @@ def create_lofi_prompt() -> str:
     Returns:
         A descriptive prompt for lo-fi music generation
     """
-    import random
-    
-    tempos = ["80 BPM", "85 BPM", "90 BPM", "75 BPM"]
-    ambiences = [
-        "soft rain ambience",
-        "gentle cafe background",
-        "quiet library atmosphere",
-        "peaceful nature sounds",
-        "subtle vinyl crackle"
-    ]
-    instruments = [
-        "calming synth pads",
-        "mellow piano keys",
-        "warm bass lines",
-        "jazzy guitar chords",
-        "smooth rhodes piano"
-    ]
-    moods = [
-        "study focus",
-        "late night relaxation",
-        "peaceful meditation",
-        "creative flow",
-        "chill vibes"
-    ]
-    
-    tempo = random.choice(tempos)
-    ambience = random.choice(ambiences)
-    instrument = random.choice(instruments)
-    mood = random.choice(moods)
-    
-    prompt = f"Lofi study music, {tempo}, {ambience}, {instrument}, {mood}"
-    return prompt
+    return random.choice(_PROMPTS)
@@ -1,12 +1,16 @@
 """
-Windows Wake Lock - Prevents system sleep during video generation
-Uses Windows SetThreadExecutionState API for independent wake lock control
+Wake Lock - Prevents system sleep during video generation
+Uses Windows SetThreadExecutionState API for independent wake lock control,
+systemd-inhibit on Linux and caffeinate on macOS
 """
+import os
 import ctypes
+import shutil
 import logging
 import platform
+import threading
+import subprocess
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Windows constants for SetThreadExecutionState
@@ -15,74 +19,212 @@ ES_SYSTEM_REQUIRED = 0x00000001
 ES_DISPLAY_REQUIRED = 0x00000002
 ES_AWAYMODE_REQUIRED = 0x00000040
 
+# Seconds to wait for the keeper thread to set the execution state
+KEEPER_START_TIMEOUT = 5
+
+# Seconds a Linux/macOS inhibitor helper must stay running to count as started
+INHIBIT_START_GRACE = 0.5
+
+# Resolve SetThreadExecutionState once with explicit types instead of
+# walking ctypes.windll.kernel32 on every call
+if platform.system() == "Windows":
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _SetThreadExecutionState = _kernel32.SetThreadExecutionState
+    _SetThreadExecutionState.argtypes = [ctypes.c_uint32]
+    _SetThreadExecutionState.restype = ctypes.c_uint32
+else:
+    _SetThreadExecutionState = None
+
+# Process-wide inhibitor shared by all WakeLock instances (reference counted)
+_state_lock = threading.Lock()
+_holders = 0
+_keeper = None        # Windows: thread that owns the execution state
+_keeper_stop = None
+_inhibitor = None     # Linux/macOS: helper process
+
+
+def _keepalive_loop(started, stop, result):
+    """
+    Hold the execution state on a dedicated thread until stop is set
+    SetThreadExecutionState is per-thread, so one long-lived thread owns it
+    no matter which threads acquire or release WakeLocks
+    """
+    try:
+        result.append(_SetThreadExecutionState(ES_CONTINUOUS | ES_SYSTEM_REQUIRED | ES_DISPLAY_REQUIRED))
+    finally:
+        # Always unblock _start_inhibit; an empty result means the call failed
+        started.set()
+    stop.wait()
+    _SetThreadExecutionState(ES_CONTINUOUS)
+
+
+def _start_inhibit(command):
+    """
+    Engage the platform sleep inhibitor (caller holds _state_lock)
+    
+    Args:
+        command: Helper process command on Linux/macOS, None on Windows
+    
+    Returns:
+        True if the inhibitor is active
+    """
+    global _keeper, _keeper_stop, _inhibitor
+    
+    if command is None:
+        started = threading.Event()
+        stop = threading.Event()
+        result = []
+        thread = threading.Thread(
+            target=_keepalive_loop,
+            args=(started, stop, result),
+            name="WakeLockKeeper",
+            daemon=True
+        )
+        thread.start()
+        started.wait(timeout=KEEPER_START_TIMEOUT)
+        
+        if not result or not result[0]:
+            stop.set()
+            thread.join(timeout=KEEPER_START_TIMEOUT)
+            return False
+        
+        _keeper, _keeper_stop = thread, stop
+    else:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        
+        # A helper that exits straight away (no logind/dbus, polkit denial) holds nothing
+        try:
+            returncode = process.wait(timeout=INHIBIT_START_GRACE)
+        except subprocess.TimeoutExpired:
+            _inhibitor = process
+        else:
+            logger.error("%s exited immediately with code %s", command[0], returncode)
+            return False
+    return True
+
+
+def _stop_inhibit():
+    """Disengage the platform sleep inhibitor (caller holds _state_lock)"""
+    global _keeper, _keeper_stop, _inhibitor
+    
+    if _keeper is not None:
+        _keeper_stop.set()
+        _keeper.join(timeout=5)
+        _keeper = _keeper_stop = None
+    
+    if _inhibitor is not None:
+        _inhibitor.terminate()
+        _inhibitor.wait(timeout=5)
+        _inhibitor = None
+
 
 class WakeLock:
     """
-    Windows wake lock manager - prevents system sleep during active work
-    Each instance maintains its own independent lock state
+    Wake lock manager - prevents system sleep during active work
+    Instances share one reference-counted, process-wide lock: the system
+    may sleep again only once every instance has released
+    On Linux/macOS the lock is held by a helper process that is stopped on release
     """
     
     def __init__(self, lock_name="LoFiAutomation"):
         self.lock_name = lock_name
         self.is_locked = False
-        self.is_windows = platform.system() == "Windows"
+        self.system = platform.system()
+        self.is_windows = self.system == "Windows"
+        self._supported = self._check_supported()
         
-        if not self.is_windows:
-            logger.warning("Wake lock only supported on Windows. Skipping wake lock functionality.")
+        if not self._supported:
+            logger.warning("Wake lock not supported on %s. Skipping wake lock functionality.", self.system)
+    
+    def _inhibit_command(self):
+        """Command that holds a sleep inhibitor for as long as it runs (Linux/macOS)"""
+        if self.system == "Linux":
+            return [
+                "systemd-inhibit",
+                "--what=sleep:idle",
+                f"--who={self.lock_name}",
+                "--why=Video generation in progress",
+                "--mode=block",
+                # Exit with this process even if release() is never reached
+                "tail", f"--pid={os.getpid()}", "-f", "/dev/null"
+            ]
+        if self.system == "Darwin":
+            # -w: exit with this process even if release() is never reached
+            return ["caffeinate", "-dims", "-w", str(os.getpid())]
+        return None
+    
+    def _check_supported(self):
+        """Check if wake lock can be used on this system"""
+        if self.is_windows:
+            return True
+        command = self._inhibit_command()
+        return command is not None and shutil.which(command[0]) is not None
     
     def acquire(self):
         """
         Acquire wake lock - prevents system from sleeping
         System stays awake until release() is called
         """
-        if not self.is_windows:
+        global _holders
+        
+        if not self._supported:
             return
         
         if self.is_locked:
-            logger.debug(f"Wake lock '{self.lock_name}' already acquired")
+            logger.debug("Wake lock '%s' already acquired", self.lock_name)
             return
         
         try:
-            # Prevent system sleep and screen sleep
-            # ES_CONTINUOUS | ES_SYSTEM_REQUIRED | ES_DISPLAY_REQUIRED
-            result = ctypes.windll.kernel32.SetThreadExecutionState(
-                ES_CONTINUOUS | ES_SYSTEM_REQUIRED | ES_DISPLAY_REQUIRED
-            )
+            with _state_lock:
+                if _holders == 0:
+                    # First holder engages the inhibitor
+                    # (Windows: ES_CONTINUOUS | ES_SYSTEM_REQUIRED | ES_DISPLAY_REQUIRED)
+                    result = _start_inhibit(None if self.is_windows else self._inhibit_command())
+                else:
+                    result = True
+                
+                if result:
+                    _holders += 1
             
             if result:
                 self.is_locked = True
-                logger.info(f"[LOCK] Wake lock '{self.lock_name}' ACQUIRED - System will stay awake")
+                logger.info("[LOCK] Wake lock '%s' ACQUIRED - System will stay awake", self.lock_name)
             else:
-                logger.error(f"Failed to acquire wake lock '{self.lock_name}'")
+                logger.error("Failed to acquire wake lock '%s'", self.lock_name)
                 
         except Exception as e:
-            logger.error(f"Error acquiring wake lock: {e}")
+            logger.error("Error acquiring wake lock: %s", e)
     
     def release(self):
         """
-        Release wake lock - allows system to sleep normally
-        Other applications' wake locks are not affected
+        Release wake lock - allows system to sleep normally once no other
+        instance holds it; other applications' wake locks are not affected
         """
-        if not self.is_windows:
+        global _holders
+        
+        if not self._supported:
             return
         
         if not self.is_locked:
-            logger.debug(f"Wake lock '{self.lock_name}' not acquired, nothing to release")
+            logger.debug("Wake lock '%s' not acquired, nothing to release", self.lock_name)
             return
         
         try:
-            # Restore normal power management
-            result = ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS)
+            with _state_lock:
+                _holders -= 1
+                if _holders == 0:
+                    # Last holder restores normal power management
+                    _stop_inhibit()
             
-            if result or True:  # Always mark as released even if API call seems to fail
-                self.is_locked = False
-                logger.info(f"[UNLOCK] Wake lock '{self.lock_name}' RELEASED - System can sleep normally")
-            else:
-                logger.warning(f"Wake lock release may have failed for '{self.lock_name}'")
-                self.is_locked = False  # Mark as released anyway
+            self.is_locked = False
+            logger.info("[UNLOCK] Wake lock '%s' RELEASED - System can sleep normally", self.lock_name)
                 
         except Exception as e:
-            logger.error(f"Error releasing wake lock: {e}")
+            logger.error("Error releasing wake lock: %s", e)
             self.is_locked = False
     
     def __enter__(self):
@@ -112,4 +254,3 @@ def allow_sleep(lock):
     """Release a previously acquired wake lock"""
     if lock:
         lock.release()
-
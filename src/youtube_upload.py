@@ -2,21 +2,128 @@
 YouTube Data API v3 Integration for Video Upload
 """
 import os
+import json
+import time
+import random
 import logging
-from typing import Dict, Optional
-from retry import retry
+import hashlib
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httplib2
+from PIL import Image
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 from googleapiclient.errors import HttpError
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
 
+# Resumable upload chunks must be a multiple of 256 KB (-1 = whole file in one request)
+UPLOAD_CHUNK_MULTIPLE = 256 * 1024
+DEFAULT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_READ_BUFFER = 8 * 1024 * 1024  # Buffered reader size for the video body
+
+# Transient upload failures; the same chunk is resent with exponential backoff
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, http.client.HTTPException, OSError)
+MAX_CHUNK_RETRIES = 10
+
+# Request errors that won't succeed on retry (bad request, auth, permission)
+PERMANENT_STATUS_CODES = (400, 401, 403)
+
+# Network errors worth retrying a whole thumbnail request on; unlike
+# RETRIABLE_EXCEPTIONS this leaves out local OSErrors (missing file, bad image)
+THUMBNAIL_RETRIABLE_EXCEPTIONS = (
+    ConnectionError,
+    TimeoutError,
+    httplib2.HttpLib2Error,
+    http.client.HTTPException,
+)
+
+# Thumbnails without transparency are re-encoded as JPEG at this quality before upload
+THUMBNAIL_JPEG_QUALITY = 90
+
+# Access tokens with less than this left are refreshed before use
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Access token persisted between runs (next to .env) so warm starts skip the token endpoint
+TOKEN_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'token.json')
+
+# In-process credential cache, keyed by a hash of client ID + refresh token,
+# so repeated YouTubeUploader() constructions skip the token endpoint
+_CREDS_CACHE: Dict[str, Credentials] = {}
+_CREDS_LOCK = threading.Lock()
+
+
+def _creds_cache_key(client_id: str, refresh_token: str) -> str:
+    """Hash the (long, secret) client ID + refresh token into a cache key"""
+    return hashlib.sha256((client_id + refresh_token).encode()).hexdigest()
+
+
+def _build_service(creds: Credentials):
+    """
+    Build a YouTube v3 service
+    google-api-python-client 2.x reads the bundled discovery document by default,
+    so building one per instance/thread costs no network round-trip
+    """
+    return build('youtube', 'v3', credentials=creds)
+
+
+def _optimize_thumbnail(thumbnail_path: str):
+    """
+    Re-encode a thumbnail for upload, caching the result next to the original
+    
+    Args:
+        thumbnail_path: Path to thumbnail image
+    
+    Returns:
+        Tuple of (path to upload, mimetype)
+    """
+    base = os.path.splitext(thumbnail_path)[0]
+    
+    with Image.open(thumbnail_path) as img:
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        if has_alpha:
+            optimized_path, mimetype = f"{base}.opt.png", 'image/png'
+        else:
+            optimized_path, mimetype = f"{base}.opt.jpg", 'image/jpeg'
+        
+        # Reuse a previous re-encode unless the original changed since
+        if not (os.path.exists(optimized_path)
+                and os.path.getmtime(optimized_path) >= os.path.getmtime(thumbnail_path)):
+            if has_alpha:
+                img.save(optimized_path, 'PNG', optimize=True, compress_level=9)
+            else:
+                img.convert('RGB').save(optimized_path, 'JPEG', quality=THUMBNAIL_JPEG_QUALITY, optimize=True)
+    
+    # Keep the original if re-encoding didn't make it smaller
+    if os.path.getsize(optimized_path) >= os.path.getsize(thumbnail_path):
+        original_type = 'image/jpeg' if thumbnail_path.lower().endswith(('.jpg', '.jpeg')) else 'image/png'
+        return thumbnail_path, original_type
+    return optimized_path, mimetype
+
+
+def _is_retriable(error: BaseException) -> bool:
+    """Retry network errors and HTTP errors other than PERMANENT_STATUS_CODES"""
+    if isinstance(error, HttpError):
+        return error.resp.status not in PERMANENT_STATUS_CODES
+    return isinstance(error, THUMBNAIL_RETRIABLE_EXCEPTIONS)
+
+
+def _token_time_left(creds: Credentials) -> timedelta:
+    """Time until the access token expires (google-auth stores expiry as naive UTC)"""
+    if not creds.token or not creds.expiry:
+        return timedelta(0)
+    return creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class YouTubeUploader:
     """Handle YouTube video upload and metadata"""
@@ -25,15 +132,35 @@ class YouTubeUploader:
         self.client_id = client_id
         self.client_secret = client_secret
         self.refresh_token = refresh_token
+        self.creds = None
         self.youtube = None
+        self._local = threading.local()  # Per-thread service objects for upload_many
         self._authenticate()
     
     def _authenticate(self):
         """Authenticate with YouTube API using OAuth2"""
         creds = None
         
-        # If we have a refresh token from .env, use it
+        # Reuse credentials minted earlier in this process while the token is still fresh
         if self.refresh_token:
+            with _CREDS_LOCK:
+                cached = _CREDS_CACHE.get(_creds_cache_key(self.client_id, self.refresh_token))
+            if cached and _token_time_left(cached) > TOKEN_REFRESH_MARGIN:
+                logger.info("Using cached YouTube credentials")
+                creds = cached
+        
+        # Then the token saved on disk by a previous run
+        if self.refresh_token and not creds:
+            cached = self._load_token_cache()
+            if cached and _token_time_left(cached) > TOKEN_REFRESH_MARGIN:
+                logger.info("Using saved YouTube token from token.json")
+                creds = cached
+        
+        # Anything minted below (refresh or OAuth flow) gets written back to token.json
+        fresh = creds is None
+        
+        # If we have a refresh token from .env, use it
+        if self.refresh_token and not creds:
             # Create credentials from refresh token
             logger.info("Using refresh token from .env file...")
             creds = Credentials(
@@ -75,9 +202,68 @@ class YouTubeUploader:
                 logger.info("✅ Refresh token automatically saved to .env file")
                 logger.info("=" * 70)
         
-        self.youtube = build('youtube', 'v3', credentials=creds)
+        if creds.refresh_token:
+            with _CREDS_LOCK:
+                _CREDS_CACHE[_creds_cache_key(self.client_id, creds.refresh_token)] = creds
+            if fresh:
+                self._save_token_cache(creds)
+        
+        self.creds = creds
+        self.youtube = _build_service(creds)
+        self._local.youtube = self.youtube
         logger.info("Successfully authenticated with YouTube API")
     
+    def _service(self):
+        """
+        YouTube service for the calling thread
+        httplib2 connections aren't thread-safe, so each worker thread builds its own
+        """
+        youtube = getattr(self._local, 'youtube', None)
+        if youtube is None:
+            youtube = _build_service(self.creds)
+            self._local.youtube = youtube
+        return youtube
+    
+    def refresh_if_needed(self):
+        """
+        Refresh the OAuth access token if it has expired or is about to
+        Lets callers pay the token round-trip ahead of the upload
+        """
+        if self.creds and self.creds.refresh_token and _token_time_left(self.creds) <= TOKEN_REFRESH_MARGIN:
+            logger.info("Refreshing YouTube access token...")
+            self.creds.refresh(Request())
+            self._save_token_cache(self.creds)
+    
+    def _load_token_cache(self) -> Optional[Credentials]:
+        """
+        Load the access token saved by a previous run
+        
+        Returns:
+            Credentials if token.json belongs to this client and refresh token, else None
+        """
+        try:
+            with open(TOKEN_CACHE_PATH, 'r') as f:
+                info = json.load(f)
+            if not isinstance(info, dict):
+                raise ValueError(f"expected a JSON object, got {type(info).__name__}")
+            if info.get('client_id') != self.client_id or info.get('refresh_token') != self.refresh_token:
+                return None
+            return Credentials.from_authorized_user_info(info, SCOPES)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable token cache {TOKEN_CACHE_PATH}: {e}")
+            return None
+    
+    def _save_token_cache(self, creds: Credentials):
+        """Persist credentials (including access token and expiry) to token.json"""
+        try:
+            fd = os.open(TOKEN_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(creds.to_json())
+        except OSError as e:
+            logger.warning(f"Could not save token cache: {e}")
+    
     def _save_refresh_token_to_env(self, refresh_token: str):
         """Save refresh token to .env file automatically"""
         env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
@@ -109,7 +295,6 @@ class YouTubeUploader:
         
         logger.info(f"Refresh token saved to {env_path}")
     
-    @retry(tries=3, delay=10, backoff=2)
     def upload_video(
         self,
         video_path: str,
@@ -117,7 +302,8 @@ class YouTubeUploader:
         description: str,
         tags: list,
         category_id: str = "10",
-        privacy_status: str = "private"
+        privacy_status: str = "private",
+        chunk_size: Optional[int] = None
     ) -> str:
         """
         Upload video to YouTube
@@ -129,10 +315,17 @@ class YouTubeUploader:
             tags: List of tags
             category_id: YouTube category (10 = Music)
             privacy_status: "private", "public", or "unlisted"
+            chunk_size: Upload chunk size in bytes (multiple of 256 KB, or -1 for a
+                single request). Defaults to YT_UPLOAD_CHUNK_SIZE from .env, else 8 MB
         
         Returns:
             Video ID of uploaded video
         """
+        if chunk_size is None:
+            chunk_size = int(os.getenv('YT_UPLOAD_CHUNK_SIZE', DEFAULT_UPLOAD_CHUNK_SIZE))
+        if chunk_size != -1 and (chunk_size <= 0 or chunk_size % UPLOAD_CHUNK_MULTIPLE != 0):
+            raise ValueError(f"Upload chunk size must be a positive multiple of 256 KB or -1, got {chunk_size}")
+        
         logger.info(f"Uploading video: {title}")
         
         body = {
@@ -148,26 +341,50 @@ class YouTubeUploader:
             }
         }
         
+        # Read the body through a large buffer so each chunk is a few
+        # read() calls rather than many small ones
+        fh = open(video_path, 'rb', buffering=UPLOAD_READ_BUFFER)
         try:
-            media = MediaFileUpload(
-                video_path,
-                chunksize=-1,
-                resumable=True,
-                mimetype='video/mp4'
+            media = MediaIoBaseUpload(
+                fh,
+                mimetype='video/mp4',
+                chunksize=chunk_size,
+                resumable=True
             )
             
-            request = self.youtube.videos().insert(
+            request = self._service().videos().insert(
                 part='snippet,status',
                 body=body,
                 media_body=media
             )
             
             response = None
+            retries = 0
             while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    logger.info(f"[UPLOAD] Progress: {progress}%")
+                try:
+                    status, response = request.next_chunk()
+                except HttpError as e:
+                    if e.resp.status not in RETRIABLE_STATUS_CODES or retries >= MAX_CHUNK_RETRIES:
+                        raise
+                    error = e
+                except RETRIABLE_EXCEPTIONS as e:
+                    if retries >= MAX_CHUNK_RETRIES:
+                        raise
+                    error = e
+                else:
+                    retries = 0
+                    if status:
+                        progress = int(status.progress() * 100)
+                        logger.info(f"[UPLOAD] Progress: {progress}%")
+                    continue
+                
+                # Resumable session is still valid - back off and resend the same chunk
+                retries += 1
+                sleep_seconds = min(2 ** retries + random.random(), 64)
+                logger.warning(
+                    f"[UPLOAD] Transient error: {error} - retry {retries}/{MAX_CHUNK_RETRIES} in {sleep_seconds:.1f}s"
+                )
+                time.sleep(sleep_seconds)
             
             video_id = response['id']
             logger.info(f"Video uploaded successfully! Video ID: {video_id}")
@@ -181,8 +398,15 @@ class YouTubeUploader:
         except Exception as e:
             logger.error(f"Upload failed: {e}")
             raise
+        finally:
+            fh.close()
     
-    @retry(tries=3, delay=5, backoff=2)
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential_jitter(initial=5, max=60),
+        retry=retry_if_exception(_is_retriable),
+        reraise=True
+    )
     def set_thumbnail(self, video_id: str, thumbnail_path: str):
         """
         Upload custom thumbnail for video
@@ -194,9 +418,14 @@ class YouTubeUploader:
         logger.info(f"Uploading thumbnail for video {video_id}")
         
         try:
-            media = MediaFileUpload(thumbnail_path, mimetype='image/png')
+            upload_path, mimetype = _optimize_thumbnail(thumbnail_path)
+            logger.info(
+                f"Thumbnail size: {os.path.getsize(thumbnail_path) / 1024:.0f} KB -> "
+                f"{os.path.getsize(upload_path) / 1024:.0f} KB ({mimetype})"
+            )
+            media = MediaFileUpload(upload_path, mimetype=mimetype)
             
-            request = self.youtube.thumbnails().set(
+            request = self._service().thumbnails().set(
                 videoId=video_id,
                 media_body=media
             )
@@ -246,4 +475,33 @@ class YouTubeUploader:
             'video_id': video_id,
             'video_url': video_url
         }
-
+    
+    def upload_many(
+        self,
+        jobs: List[Dict],
+        privacy_status: str = "private",
+        concurrency: int = 3
+    ) -> List[Dict]:
+        """
+        Upload several videos concurrently (bounded by concurrency)
+        
+        Args:
+            jobs: List of dicts with video_path, thumbnail_path and metadata
+            privacy_status: Video privacy setting
+            concurrency: Maximum number of uploads in flight at once
+        
+        Returns:
+            List of dictionaries with video_id and video_url, in the same order as jobs
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(
+                    self.upload_complete_video,
+                    video_path=job['video_path'],
+                    thumbnail_path=job['thumbnail_path'],
+                    metadata=job['metadata'],
+                    privacy_status=privacy_status
+                )
+                for job in jobs
+            ]
+            return [future.result() for future in futures]